@@ -1,3 +1,7 @@
+import bisect
+import csv
+import os
+import numpy as np
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
@@ -8,88 +12,183 @@ st.set_page_config(layout="wide", page_title="Macro Tracker")
 # --- File Paths ---
 FOOD_DB_FILE = 'food_database.csv'
 DAILY_LOG_FILE = 'daily_log.csv'
+MACRO_COLS = ['calories', 'protein', 'carbs', 'fat']
+# Macros are only ever scaled, summed and shown to one decimal, so float32 is plenty.
+MACRO_DTYPES = dict.fromkeys(MACRO_COLS, 'float32')
+LOG_DTYPES = {'date': 'datetime64[ns]', **MACRO_DTYPES}
+FOOD_COLUMNS = ['food_name'] + MACRO_COLS
+LOG_COLUMNS = ['date', 'name', 'amount_logged'] + MACRO_COLS
+# Serving unit implied by the last part of a food_name, e.g. 'curd_100g'.
+UNIT_LABELS = {
+    '100g': 'grams (g)', 'scoop': 'scoop(s)', 'slice': 'slice(s)',
+    'katori': 'katori(s)', 'tbsp': 'tablespoon(s)', 'medium': 'piece(s)',
+}
 
 # --- Data Loading & Management ---
-@st.cache_data
+# The food DB is read-only, so share one copy across reruns and sessions instead of
+# unpickling a fresh DataFrame on every cache hit.
+@st.cache_resource
 def load_food_database():
     try:
-        df = pd.read_csv(FOOD_DB_FILE)
-        df.columns = [col.lower().strip() for col in df.columns]
-        df = df.sort_values(by='food_name').reset_index(drop=True)
-        return df
+        df = pd.read_csv(FOOD_DB_FILE, usecols=lambda col: col.lower().strip() in FOOD_COLUMNS)
+        df.columns = df.columns.str.lower().str.strip()
+        df = df.astype(MACRO_DTYPES)
+        # Indexed by food_name so a logged food is a single .loc lookup.
+        df = df.sort_values(by='food_name').set_index('food_name')
     except FileNotFoundError:
         st.error(f"Error: '{FOOD_DB_FILE}' not found. Please create it.")
-        return pd.DataFrame(columns=['food_name', 'calories', 'protein', 'carbs', 'fat'])
+        df = pd.DataFrame(columns=FOOD_COLUMNS).set_index('food_name')
+
+    # Derive the display fields once here rather than per row on every rerun.
+    names = df.index.astype(str)
+    suffix = names.str.rsplit('_', n=1).str[-1]
+    df['display_name'] = names.str.replace('_', ' ').str.title()
+    df['unit'] = suffix.map(UNIT_LABELS).fillna('unit(s)')
+    df['base_amount'] = np.where(suffix == '100g', 100.0, 1.0)
+    # Lowercased names as a fixed-width string array so search can use np.char.find.
+    names_lower = np.array(names.str.lower(), dtype=str)
+    return df, names_lower
 
-def load_daily_log():
+@st.cache_data
+def load_daily_log(mtime):
+    # mtime is only the cache key: a new session reuses the parsed log until the file changes.
     try:
-        log_df = pd.read_csv(DAILY_LOG_FILE, parse_dates=['date'], dayfirst=True)
-        return log_df.to_dict('records')
+        log_df = pd.read_csv(DAILY_LOG_FILE, usecols=LOG_COLUMNS, dtype=MACRO_DTYPES)
+        # Dates are always written as dd/mm/yyyy; an explicit format avoids per-row inference.
+        log_df['date'] = pd.to_datetime(log_df['date'], format='%d/%m/%Y')
+        return log_df.astype(LOG_DTYPES)
     except (FileNotFoundError, pd.errors.EmptyDataError):
-        return []
-
-def save_daily_log(log_data):
-    if not log_data:
-        pd.DataFrame(columns=['date', 'name', 'amount_logged', 'calories', 'protein', 'carbs', 'fat']).to_csv(DAILY_LOG_FILE, index=False)
+        return pd.DataFrame(columns=LOG_COLUMNS).astype(LOG_DTYPES)
+
+def daily_log_mtime():
+    return os.path.getmtime(DAILY_LOG_FILE) if os.path.exists(DAILY_LOG_FILE) else 0
+
+def append_log_row(entry):
+    # Logging only adds a row, so append it instead of rewriting the whole file.
+    write_header = not os.path.exists(DAILY_LOG_FILE) or os.path.getsize(DAILY_LOG_FILE) == 0
+    with open(DAILY_LOG_FILE, 'a', newline='', buffering=8192) as f:
+        writer = csv.DictWriter(f, fieldnames=LOG_COLUMNS, lineterminator='\n')
+        if write_header:
+            writer.writeheader()
+        writer.writerow({**entry, 'date': entry['date'].strftime('%d/%m/%Y')})
+    load_daily_log.clear()
+
+def save_daily_log(log_df):
+    # Full rewrite, only needed when entries are deleted.
+    log_df.assign(date=log_df['date'].dt.strftime('%d/%m/%Y')).to_csv(DAILY_LOG_FILE, index=False)
+    load_daily_log.clear()
+
+def index_logs_by_date(log_df):
+    # Maps each date to the ids (index labels) of its entries in log_df.
+    return {d: list(ids) for d, ids in log_df.groupby(log_df['date'].dt.date).groups.items()}
+
+# --- Log Actions ---
+def log_food(food_data, amount):
+    unit = food_data['unit']
+    multiplier = amount / food_data['base_amount']
+
+    scaled = food_data[MACRO_COLS].to_numpy(dtype=np.float32) * np.float32(multiplier)
+    new_entry = {
+        'date': datetime.now(), 'name': food_data['display_name'], 'amount_logged': f"{amount} {unit}",
+        **dict(zip(MACRO_COLS, scaled)),
+    }
+    # New rows go at the end so the session log stays in file order (oldest first). The index
+    # doubles as a stable entry id, so it is never reset; a new entry takes the next free id.
+    log_df = st.session_state.log_df
+    entry_id = log_df.index.max() + 1 if len(log_df) else 0
+    new_row = pd.DataFrame([new_entry], columns=LOG_COLUMNS, index=[entry_id]).astype(LOG_DTYPES)
+    st.session_state.log_df = pd.concat([log_df, new_row]) if len(log_df) else new_row
+    entry_date = new_entry['date'].date()
+    if entry_date not in st.session_state.logs_by_date:
+        bisect.insort(st.session_state.log_dates, entry_date)
+    st.session_state.logs_by_date.setdefault(entry_date, []).append(entry_id)
+    append_log_row(new_entry)
+
+# --- Food Column ---
+@st.experimental_fragment
+def render_food_column(food_df, food_names_lower):
+    # Typing a search or picking a food only reruns this column; logging reruns the whole app
+    # so the totals and the log panel pick up the new entry.
+    st.subheader("🥑 Food Database")
+    search = st.text_input("Search for a food item...")
+    if search:
+        df = food_df[np.char.find(food_names_lower, search.lower()) >= 0]
+    else:
+        df = food_df
+    if df.empty:
+        st.write("No matching foods.")
         return
-    df = pd.DataFrame(log_data)
-    df['date'] = pd.to_datetime(df['date']).dt.strftime('%d/%m/%Y')
-    df.to_csv(DAILY_LOG_FILE, index=False)
+
+    # A single picker and form for the chosen food instead of a button per food.
+    food_name = st.selectbox("Food", df.index, format_func=df['display_name'].get)
+    food_data = food_df.loc[food_name]
+    with st.form(key="log_food_form"):
+        amount = st.number_input(f"Amount ({food_data['unit']})", min_value=0.1, value=1.0, step=0.1)
+        if st.form_submit_button("Log Food"):
+            log_food(food_data, amount)
+            st.rerun()
+
+# --- Log Panel ---
+@st.experimental_fragment
+def render_log_panel(selected_date, selected_date_str):
+    # Picking an entry to delete only reruns this panel; the delete itself reruns the whole
+    # app because the totals and date selector depend on it.
+    entry_ids = st.session_state.logs_by_date.get(selected_date, [])
+    daily_log = st.session_state.log_df.loc[entry_ids]
+    st.subheader(f"📝 Log for {selected_date_str}")
+    if daily_log.empty:
+        st.write("No items logged.")
+    else:
+        newest_first = daily_log.iloc[::-1]
+        st.dataframe(
+            newest_first[['name', 'amount_logged'] + MACRO_COLS], hide_index=True, use_container_width=True,
+            column_config={
+                'name': 'Food', 'amount_logged': 'Amount',
+                'calories': st.column_config.NumberColumn("🔥 kcal", format="%.0f"),
+                'protein': st.column_config.NumberColumn("💪 P (g)", format="%.1f"),
+                'carbs': st.column_config.NumberColumn("🍞 C (g)", format="%.1f"),
+                'fat': st.column_config.NumberColumn("🥑 F (g)", format="%.1f"),
+            })
+
+        # One delete control for the whole day instead of a button per entry.
+        labels = dict(zip(newest_first.index, newest_first['name'] + " (" + newest_first['amount_logged'] + ")"))
+        c1, c2 = st.columns([5, 1])
+        to_delete = c1.selectbox("Entry to delete", list(labels), format_func=labels.get,
+                                 label_visibility="collapsed")
+        if c2.button("Del", use_container_width=True):
+            st.session_state.log_df = st.session_state.log_df.drop(index=to_delete)
+            entry_ids.remove(to_delete)
+            if not entry_ids:
+                del st.session_state.logs_by_date[selected_date]
+                st.session_state.log_dates.remove(selected_date)
+            save_daily_log(st.session_state.log_df)
+            st.rerun()
 
 # --- Main App ---
 def main():
-    food_df = load_food_database()
-    if 'all_logs' not in st.session_state:
-        st.session_state.all_logs = load_daily_log()
-        for entry in st.session_state.all_logs:
-            if isinstance(entry['date'], str):
-                entry['date'] = datetime.strptime(entry['date'], '%d/%m/%Y')
+    food_df, food_names_lower = load_food_database()
+    if 'log_df' not in st.session_state:
+        st.session_state.log_df = load_daily_log(daily_log_mtime())
+        st.session_state.logs_by_date = index_logs_by_date(st.session_state.log_df)
+        st.session_state.log_dates = sorted(st.session_state.logs_by_date)
 
     st.title("🥗 Personal Macro Tracker")
 
     # --- Date Selector ---
     today = datetime.now().date()
-    today_str = today.strftime('%d/%m/%Y')
-    all_dates = {entry['date'].strftime('%d/%m/%Y') for entry in st.session_state.all_logs}
-    all_dates.add(today_str)
-    sorted_dates = sorted(list(all_dates), key=lambda x: datetime.strptime(x, '%d/%m/%Y'), reverse=True)
+    sorted_dates = st.session_state.log_dates[::-1]
+    if today not in st.session_state.logs_by_date:
+        sorted_dates.insert(0, today)
     
-    selected_date_str = st.selectbox("Select date to view log", sorted_dates)
-    selected_date = datetime.strptime(selected_date_str, '%d/%m/%Y').date()
-    daily_log = [e for e in st.session_state.all_logs if e['date'].date() == selected_date]
-
-    # --- Form for Logging New Food ---
-    if "food_to_log" in st.session_state:
-        food_data = st.session_state.food_to_log
-        food_name_display = food_data['food_name'].replace('_', ' ').title()
-
-        with st.expander(f"Log: {food_name_display}", expanded=True):
-            with st.form(key="log_food_form"):
-                base_amount_str = food_data['food_name'].split('_')[-1]
-                units = {'100g': 'grams (g)', 'scoop': 'scoop(s)', 'slice': 'slice(s)'}
-                unit = next((u for k, u in units.items() if k in base_amount_str), "unit(s)")
-
-                amount = st.number_input(f"Amount ({unit})", min_value=0.1, value=1.0, step=0.1)
-                
-                submitted = st.form_submit_button("Log Food")
-                if submitted:
-                    base_amount = 100.0 if '100g' in base_amount_str else 1.0
-                    multiplier = amount / base_amount if base_amount != 1.0 else amount
-                    
-                    st.session_state.all_logs.insert(0, {
-                        'date': datetime.now(), 'name': food_name_display, 'amount_logged': f"{amount} {unit}",
-                        'calories': food_data['calories'] * multiplier, 'protein': food_data['protein'] * multiplier,
-                        'carbs': food_data['carbs'] * multiplier, 'fat': food_data['fat'] * multiplier,
-                    })
-                    save_daily_log(st.session_state.all_logs)
-                    
-                    del st.session_state['food_to_log']
-                    st.rerun()
+    selected_date = st.selectbox("Select date to view log", sorted_dates,
+                                 format_func=lambda d: d.strftime('%d/%m/%Y'))
+    selected_date_str = selected_date.strftime('%d/%m/%Y')
+    daily_log = st.session_state.log_df.loc[st.session_state.logs_by_date.get(selected_date, [])]
 
     # --- Daily Totals ---
     st.subheader(f"📊 Totals for {selected_date_str}")
-    if daily_log:
-        totals = {k: sum(item.get(k, 0) for item in daily_log) for k in ['calories', 'protein', 'carbs', 'fat']}
+    if not daily_log.empty:
+        totals = daily_log[MACRO_COLS].sum()
         c1, c2, c3, c4 = st.columns(4)
         c1.metric("Calories", f"{totals['calories']:.0f} kcal")
         c2.metric("Protein", f"{totals['protein']:.1f} g")
@@ -104,33 +203,10 @@ def main():
     col_food, col_log = st.columns([2, 1.5])
 
     with col_food:
-        st.subheader("🥑 Food Database")
-        search = st.text_input("Search for a food item...")
-        df = food_df[food_df['food_name'].str.contains(search, case=False)] if search else food_df
-        for _, row in df.iterrows():
-            name = row['food_name'].replace('_', ' ').title()
-            if st.button(name, key=f"log_{row['food_name']}", use_container_width=True):
-                st.session_state.food_to_log = row.to_dict()
-                st.rerun()
+        render_food_column(food_df, food_names_lower)
 
     with col_log:
-        st.subheader(f"📝 Log for {selected_date_str}")
-        if not daily_log:
-            st.write("No items logged.")
-        else:
-            indices = [i for i, e in enumerate(st.session_state.all_logs) if e['date'].date() == selected_date]
-            for i in reversed(indices):
-                entry = st.session_state.all_logs[i]
-                with st.container(border=True):
-                    c1, c2 = st.columns([5, 1])
-                    c1.markdown(f"**{entry['name']}** ({entry.get('amount_logged', '')})")
-                    macros = (f"🔥 {entry.get('calories', 0):.0f} kcal | 💪 {entry.get('protein', 0):.1f}g P | "
-                              f"🍞 {entry.get('carbs', 0):.1f}g C | 🥑 {entry.get('fat', 0):.1f}g F")
-                    c1.text(macros)
-                    if c2.button("Del", key=f"del_{i}", use_container_width=True):
-                        st.session_state.all_logs.pop(i)
-                        save_daily_log(st.session_state.all_logs)
-                        st.rerun()
+        render_log_panel(selected_date, selected_date_str)
 
 if __name__ == "__main__":
     main()